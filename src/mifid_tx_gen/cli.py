@@ -11,10 +11,11 @@ def main() -> None:
     p.add_argument("--xsd-dir", required=False, type=Path, help="XSD directory")
     p.add_argument("--validate", action="store_true", help="Validate output against XSDs")
     p.add_argument("--xsd-main", type=Path, help="Main XSD file (optional; otherwise auto-chosen)")
+    p.add_argument("--arrow", action="store_true", help="Parse the CSV with PyArrow (pip install '.[arrow]')")
 
     args = p.parse_args()
 
-    gen = ReportGenerator.from_paths(args.csv, args.config, args.xsd_dir)
+    gen = ReportGenerator.from_paths(args.csv, args.config, args.xsd_dir, use_arrow=args.arrow)
     out = gen.generate(args.out)
     print(f"Generated XML: {out}")
 
@@ -17,12 +17,12 @@ def _rename_xmlns_keys(obj):
         return [_rename_xmlns_keys(x) for x in obj]
     return obj
 
-@dataclass
+@dataclass(slots=True)
 class MappingRule:
     from_field: str
     to_path: str  # QName path relative to record element
 
-@dataclass
+@dataclass(slots=True)
 class RootSpec:
     qname: str
     attributes: Dict[str, str] = field(default_factory=dict)
@@ -32,7 +32,7 @@ class RootSpec:
 
 from dataclasses import dataclass, field
 
-@dataclass
+@dataclass(slots=True)
 class GeneratorConfig:
     namespaces: dict[str, str]
     root: RootSpec
@@ -42,6 +42,8 @@ class GeneratorConfig:
     # ISO style:
     record_container_qname: str | None = None
     record_element_qname: str | None = None
+    # (rule, Clark-qualified path parts, attribute name or None), built lazily
+    _compiled_rules: list | None = field(default=None, init=False, repr=False, compare=False)
 
     @classmethod
     def load(cls, path: Path) -> "GeneratorConfig":
@@ -58,6 +60,45 @@ class GeneratorConfig:
             record_element_qname=data.get("record_element_qname"),
         )
 
+    def clark(self, qname: str, default_ns: str | None = None) -> str:
+        """Turn 'prefix:local' (or bare 'local' in default_ns) into '{uri}local'."""
+        if ":" in qname:
+            prefix, local = qname.split(":", 1)
+            uri = self.namespaces.get(prefix)
+            if not uri:
+                raise KeyError(f"Unknown namespace prefix '{prefix}' in qname '{qname}'")
+            return f"{{{uri}}}{local}"
+        return f"{{{default_ns}}}{qname}" if default_ns else qname
+
+    def compiled_rules(self) -> list[tuple[MappingRule, tuple[str, ...], Optional[str]]]:
+        """
+        Field rules with their to_path pre-split and namespace-qualified, so builders
+        never parse paths per row. Bare segments go to the 'msg' (record) namespace;
+        a trailing 'Elem@attr' segment yields the attribute name separately.
+        Compiled on first use, i.e. after augment_namespaces_from_xsd.
+        """
+        if self._compiled_rules is None:
+            self._compiled_rules = self._compile_rules()
+        return self._compiled_rules
+
+    def _compile_rules(self) -> list[tuple[MappingRule, tuple[str, ...], Optional[str]]]:
+        default_ns = self.namespaces.get("msg")
+        compiled = []
+        for rule in self.fields:
+            parts: list[str] = []
+            attr = None
+            for part in rule.to_path.split("/"):
+                if not part:
+                    continue
+                if "@" in part:
+                    part, attr = part.split("@", 1)
+                    if part:
+                        parts.append(self.clark(part, default_ns))
+                    break
+                parts.append(self.clark(part, default_ns))
+            compiled.append((rule, tuple(parts), attr))
+        return compiled
+
     def augment_namespaces_from_xsd(self, xsd_dir: Path | None) -> None:
         if not xsd_dir or not Path(xsd_dir).exists():
             return
@@ -3,15 +3,87 @@ from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
 import csv
+from itertools import islice
 from typing import Iterator
 
-@dataclass
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pac
+    _HAS_ARROW = True
+except Exception:
+    _HAS_ARROW = False
+
+# Bytes per block handed to PyArrow's multithreaded CSV parser
+ARROW_BLOCK_SIZE = 8 << 20
+
+@dataclass(slots=True)
 class CsvReader:
     path: Path
     delimiter: str = ","
+    # opt in to PyArrow's C++ parser (pip install '.[arrow]'); ignored when not installed
+    use_arrow: bool = False
+
+    @property
+    def uses_arrow(self) -> bool:
+        # the Arrow path may re-read the file (see _rows_arrow): regular files only, not pipes
+        return self.use_arrow and _HAS_ARROW and self.path.is_file()
 
     def rows(self) -> Iterator[dict[str, str]]:
-        with self.path.open(newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f, delimiter=self.delimiter)
+        if self.uses_arrow:
+            yield from self._rows_arrow()
+        else:
+            yield from self._rows_stdlib()
+
+    def _rows_arrow(self) -> Iterator[dict[str, str]]:
+        done = 0
+        try:
+            for batch in self._arrow_batches():
+                yield from batch.to_pylist()
+                done += batch.num_rows
+        except pa.ArrowInvalid:
+            # a row with a wrong number of cells: the stdlib reader pads/truncates those,
+            # so let it carry on from the first row Arrow did not hand out
+            yield from islice(self._rows_stdlib(), done, None)
+
+    def _arrow_batches(self) -> Iterator["pa.RecordBatch"]:
+        """
+        Same data as _rows_stdlib, parsed by pyarrow.csv in blocks. Every column is read
+        as a string (no type inference) and whitespace-trimmed per column, not per cell.
+        Rows with a wrong number of cells raise pa.ArrowInvalid (see _rows_arrow).
+        """
+        with self.path.open("rb") as f:
+            # header from the same handle Arrow then reads the data rows from
+            line = f.readline()
+            if not line:
+                return
+            keys = [k.strip() for k in next(csv.reader([line.decode("utf-8")], delimiter=self.delimiter))]
+            reader = pac.open_csv(
+                f,
+                read_options=pac.ReadOptions(column_names=keys, block_size=ARROW_BLOCK_SIZE),
+                parse_options=pac.ParseOptions(delimiter=self.delimiter),
+                convert_options=pac.ConvertOptions(
+                    column_types={k: pa.string() for k in keys},
+                    strings_can_be_null=False,
+                ),
+            )
+            for batch in reader:
+                columns = [pc.utf8_trim_whitespace(col) for col in batch.columns]
+                yield pa.RecordBatch.from_arrays(columns, names=keys)
+
+    def _rows_stdlib(self) -> Iterator[dict[str, str]]:
+        with self.path.open(newline="", encoding="utf-8", buffering=1 << 20) as f:
+            reader = csv.reader(f, delimiter=self.delimiter)
+            header = next(reader, None)
+            if header is None:
+                return
+            # Strip header keys once, not per row
+            keys = [k.strip() for k in header]
+            n = len(keys)
             for row in reader:
-                yield {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items()}
+                if not row:
+                    continue  # blank line (DictReader skipped these too)
+                if len(row) < n:
+                    # Keep every column present so the mapper never mistakes it for a literal
+                    row += [""] * (n - len(row))
+                yield {k: v.strip() for k, v in zip(keys, row)}
@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Any
 
-@dataclass
+@dataclass(slots=True)
 class TradeRecord:
     data: dict[str, Any] = field(default_factory=dict)
 
@@ -1,49 +1,31 @@
-
 from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
 from .config import GeneratorConfig
 from .csv_reader import CsvReader
-from .domain import TradeRecord
 from .mapper import FieldMapper
-from .xml_builder import XmlBuilder
+from .xml_builder_iso import IsoXmlBuilder
 
 
-try:
-    from .xml_builder_iso import IsoXmlBuilder as PreferredBuilder
-    _HAS_LXML = True
-except Exception:
-    from .xml_builder import XmlBuilder as PreferredBuilder
-    _HAS_LXML = False
+PreferredBuilder = IsoXmlBuilder
 
-@dataclass
+@dataclass(slots=True)
 class ReportGenerator:
     cfg: GeneratorConfig
     csv_path: Path
+    # parse the CSV with PyArrow when installed, see CsvReader.use_arrow
+    use_arrow: bool = False
 
     @classmethod
-    def from_paths(cls, csv_path: Path, cfg_path: Path, xsd_dir: str | None) -> "ReportGenerator":
+    def from_paths(cls, csv_path: Path, cfg_path: Path, xsd_dir: str | None,
+                   use_arrow: bool = False) -> "ReportGenerator":
         cfg = GeneratorConfig.load(cfg_path)
         cfg.augment_namespaces_from_xsd(Path(xsd_dir) if xsd_dir else None)
-        return cls(cfg=cfg, csv_path=csv_path)
+        return cls(cfg=cfg, csv_path=csv_path, use_arrow=use_arrow)
 
     def generate(self, out_path: Path) -> Path:
         builder = PreferredBuilder(self.cfg)
-        if _HAS_LXML and hasattr(builder, "build_root"):
-            root, container = builder.build_root()  # lxml path
-            mapper = FieldMapper(self.cfg)
-            for row in CsvReader(self.csv_path).rows():
-                fields = mapper.to_xml_fields(TradeRecord(row))
-                builder.append_tx(container, fields)  # lxml method
-            builder.write(root, out_path)
-        else:
-            # stdlib fallback
-            b = XmlBuilder(self.cfg)
-            root = b.build_root()
-            mapper = FieldMapper(self.cfg)
-            for row in CsvReader(self.csv_path).rows():
-                fields = mapper.to_xml_fields(TradeRecord(row))
-                b.append_record(root, fields)
-            b.write(root, out_path, pretty=True)
+        # lxml streaming path: one Tx in memory at a time
+        rows = CsvReader(self.csv_path, use_arrow=self.use_arrow).rows()
+        builder.stream_write(out_path, rows, FieldMapper(self.cfg))
         return out_path
-
@@ -1,29 +1,61 @@
 # mapper.py
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
 from .domain import TradeRecord
 from .config import GeneratorConfig, MappingRule, resolve_macros
 
-@dataclass
+@dataclass(slots=True)
 class FieldMapper:
     cfg: GeneratorConfig
+    # from_field -> resolve_macros(from_field), computed once per report (ENV/NOW are constant across rows)
+    literal_values: dict[str, str] = field(default_factory=dict, init=False, repr=False)
+    # (parts, attr, csv column or None, prebuilt literal field) in rule order, see _partition()
+    _rules: list | None = field(default=None, init=False, repr=False)
 
-    def to_xml_fields(self, trade: TradeRecord) -> List[tuple[str, str]]:
-        """
-        - If MappingRule.from_field is a CSV column, take its value.
-        - Otherwise treat it as a literal/macro and resolve it (ENV/NOW/plain strings).
-        """
-        pairs: list[tuple[str, str]] = []
+    def __post_init__(self) -> None:
         for rule in self.cfg.fields:
+            if rule.from_field not in self.literal_values:
+                self.literal_values[rule.from_field] = resolve_macros(rule.from_field)
+
+    def _partition(self, columns: frozenset[str]) -> None:
+        """Split rules into CSV-column and literal ones, once, from the file's column set."""
+        rules = []
+        for rule, parts, attr in self.cfg.compiled_rules():
             src = rule.from_field
-            if src in trade.data:
-                val = trade.get(src, None)
+            if src in columns:
+                rules.append((parts, attr, src, None))
             else:
-                val = resolve_macros(src)  # handles {ENV:...}, {NOW_ISO}, or plain strings like "false", "NORE"
+                val = self.literal_values[src]  # pre-resolved {ENV:...}, {NOW_ISO}, or plain strings like "false", "NORE"
+                if val is not None and str(val) != "":
+                    rules.append((parts, attr, None, (parts, attr, str(val))))
+        self._rules = rules
 
-            if val is None or str(val) == "":
+    def iter_xml_fields(self, trade: TradeRecord) -> Iterator[tuple[tuple[str, ...], Optional[str], str]]:
+        """
+        - If MappingRule.from_field is a CSV column, take its value.
+        - Otherwise treat it as a literal/macro and resolve it (ENV/NOW/plain strings).
+        Yields (compiled path parts, attribute or None, value) per non-empty field, in rule
+        order; see GeneratorConfig.compiled_rules. Which rules are columns is decided from
+        the first trade's keys; every later trade is expected to have the same columns.
+        Literal fields are yielded as the same tuple for every trade.
+        Feeds IsoXmlBuilder.append_tx (in-memory builds); generate() streams through the
+        compiled builder instead (xml_builder_iso.compile_tx_builder).
+        """
+        data = trade.data
+        if self._rules is None:
+            self._partition(frozenset(data))
+        for parts, attr, column, literal in self._rules:
+            if column is None:
+                yield literal
+                continue
+            val = data.get(column)
+            if val is None:
                 continue
+            val = str(val)
+            if val:
+                yield parts, attr, val
 
-            pairs.append((rule.to_path, str(val)))
-        return pairs
+    def to_xml_fields(self, trade: TradeRecord) -> List[tuple[tuple[str, ...], Optional[str], str]]:
+        """iter_xml_fields() as a list."""
+        return list(self.iter_xml_fields(trade))
@@ -4,14 +4,14 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Iterable, Tuple, Optional, List
 
-import xmlschema
-from xmlschema.validators.exceptions import XMLSchemaValidationError, XMLSchemaException
+from lxml import etree as LET
 
 
 # validator.py
 HEAD003_NS = "urn:iso:std:iso:20022:tech:xsd:head.003.001.01"
 HEAD001_NS = "urn:iso:std:iso:20022:tech:xsd:head.001.001.01"
 AUTH016_NS = "urn:iso:std:iso:20022:tech:xsd:auth.016.001.01"
+XS_NS = "http://www.w3.org/2001/XMLSchema"
 
 
 
@@ -49,13 +49,52 @@ def _scan_ns_locations(xsd_dir: Path) -> Dict[str, str]:
     return locations
 
 
+def _load_lxml_schema(main_xsd: Path,
+                      locations: Optional[Dict[str, str]] = None) -> Tuple[LET.XMLSchema, List[str]]:
+    """
+    Build a libxml2 schema from main_xsd plus the ns->xsd `locations`.
+    libxml2 has no equivalent of xmlschema's `locations`, so an in-memory wrapper schema
+    xs:imports every namespace; that makes the strict xs:any header/payload content of
+    head.003 resolvable. Returns the schema and the schema URLs it was built from.
+    """
+    main_url = main_xsd.resolve().as_uri()
+    main_ns = LET.parse(str(main_xsd)).getroot().get("targetNamespace")
+
+    wrapper = LET.Element(f"{{{XS_NS}}}schema", nsmap={"xs": XS_NS})
+    if main_ns:
+        LET.SubElement(wrapper, f"{{{XS_NS}}}import", namespace=main_ns, schemaLocation=main_url)
+    else:
+        LET.SubElement(wrapper, f"{{{XS_NS}}}include", schemaLocation=main_url)
+    urls = [main_url]
+    for ns, url in (locations or {}).items():
+        if ns == main_ns:
+            continue
+        LET.SubElement(wrapper, f"{{{XS_NS}}}import", namespace=ns, schemaLocation=url)
+        urls.append(url)
+    return LET.XMLSchema(LET.ElementTree(wrapper)), urls
+
+
+def _declared_elements(xsd_urls: Iterable[str]) -> List[str]:
+    """Clark names of the global elements declared by the given XSD files."""
+    declared: List[str] = []
+    for url in xsd_urls:
+        root = LET.parse(url).getroot()
+        tns = root.get("targetNamespace")
+        for el in root.iterchildren(f"{{{XS_NS}}}element"):
+            name = el.get("name")
+            declared.append(f"{{{tns}}}{name}" if tns else name)
+    return declared
+
+
 def _load_schema_with_bases(main_xsd: Path,
                             base_urls: Iterable[str],
-                            locations: Optional[Dict[str, str]] = None) -> xmlschema.XMLSchema:
+                            locations: Optional[Dict[str, str]] = None):
     """
-    Try to load the main XSD using a list of base URLs.
+    Try to load the main XSD with xmlschema using a list of base URLs.
     Returns the first successfully built XMLSchema, otherwise raises the last error.
     """
+    import xmlschema
+
     last_err: Optional[Exception] = None
     for base_url in base_urls:
         try:
@@ -71,21 +110,25 @@ def _load_schema_with_bases(main_xsd: Path,
     raise last_err
 
 
-def _assert_bizdata_declared(schema: xmlschema.XMLSchema, main_xsd: Path) -> None:
-    """
-    Guard to ensure the loaded schema actually declares the head.003 BizData element.
-    Gives a helpful list of what *was* declared otherwise.
-    """
+def _xmlschema_declared(schema) -> List[str]:
     try:
         declared = schema.maps.elements  # xmlschema >= 1.3
     except AttributeError:
         # Fallback for older versions
         declared = getattr(schema, "elements", {})
+    return list(declared.keys())
+
 
+def _assert_bizdata_declared(declared: Iterable[str], main_xsd: Path) -> None:
+    """
+    Guard to ensure the loaded schema actually declares the head.003 BizData element.
+    Gives a helpful list of what *was* declared otherwise.
+    """
+    declared = set(declared)
     key = f"{{{HEAD003_NS}}}BizData"
     if key not in declared:
         # Provide a readable dump of declared element QNames
-        declared_list = "\n  - ".join(sorted(declared.keys()))
+        declared_list = "\n  - ".join(sorted(declared))
         raise RuntimeError(
             "Main XSD loaded, but it does NOT declare the global element 'BizData' "
             f"in namespace {HEAD003_NS}.\n"
@@ -99,7 +142,9 @@ def validate_xml(out_path, xsd_dir, main_xsd) -> None:
     """
     Validate the XML document at out_path against the provided main_xsd.
     The validator will:
-      - Use main_xsd.parent, xsd_dir, and cwd as candidate base URLs.
+      - Validate with libxml2 (lxml.etree.XMLSchema), falling back to xmlschema
+        only if the libxml2 schema cannot be built.
+      - Use main_xsd.parent, xsd_dir, and cwd as candidate base URLs (xmlschema fallback).
       - Provide ns->xsd mapping from xsd_dir when available.
       - Fail fast if BizData isn't declared by the loaded schema.
     Raises:
@@ -134,10 +179,21 @@ def validate_xml(out_path, xsd_dir, main_xsd) -> None:
     # Optional ns->schema mapping from directory scan
     locations = _scan_ns_locations(xsd_dir)
 
-    # Try loading the schema with the candidate base URLs
+    # libxml2 (lxml) first; xmlschema with the candidate base URLs only if that fails
+    lxml_err: Optional[Exception] = None
+    try:
+        schema, schema_urls = _load_lxml_schema(main_xsd, locations)
+        _assert_bizdata_declared(_declared_elements(schema_urls), main_xsd)
+    except Exception as e:
+        lxml_err = e
+
+    if lxml_err is None:
+        _validate_with_lxml(schema, out_path, main_xsd, locations)
+        return
+
     try:
         schema = _load_schema_with_bases(main_xsd, base_urls, locations=locations)
-        _assert_bizdata_declared(schema, main_xsd)
+        _assert_bizdata_declared(_xmlschema_declared(schema), main_xsd)
     except Exception as e:
         tried = ", ".join(base_urls) or "(none)"
         raise RuntimeError(
@@ -145,10 +201,36 @@ def validate_xml(out_path, xsd_dir, main_xsd) -> None:
             f"Main XSD: {main_xsd}\n"
             f"Tried base URLs: [{tried}]\n"
             f"Namespace locations: {locations or '(none)'}\n"
+            f"libxml2 error: {lxml_err}\n"
             f"Error: {e}"
         ) from e
 
-    # Now validate the instance
+    _validate_with_xmlschema(schema, out_path, main_xsd, base_urls, locations)
+
+
+def _validate_with_lxml(schema: LET.XMLSchema, out_path: Path, main_xsd: Path,
+                        locations: Dict[str, str]) -> None:
+    try:
+        schema.assertValid(LET.parse(str(out_path)))
+    except LET.DocumentInvalid as ve:
+        raise RuntimeError(
+            "XML validation failed.\n"
+            f"Main XSD: {main_xsd}\n"
+            f"Namespace locations: {locations or '(none)'}\n"
+            f"Validation error: {ve}"
+        ) from ve
+    except LET.XMLSyntaxError as xe:
+        raise RuntimeError(
+            "XML validation could not parse the instance document.\n"
+            f"Main XSD: {main_xsd}\n"
+            f"Error: {xe}"
+        ) from xe
+
+
+def _validate_with_xmlschema(schema, out_path: Path, main_xsd: Path,
+                             base_urls: List[str], locations: Dict[str, str]) -> None:
+    from xmlschema.validators.exceptions import XMLSchemaValidationError, XMLSchemaException
+
     try:
         schema.validate(str(out_path))
     except XMLSchemaValidationError as ve:
@@ -1,27 +1,60 @@
 
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import xml.etree.ElementTree as ET
 from pathlib import Path
+from typing import Iterable
 from .config import GeneratorConfig, resolve_macros
-import xml.dom.minidom
+from lxml import etree as LET
 
-@dataclass
+@dataclass(slots=True)
 class XmlBuilder:
     cfg: GeneratorConfig
+    # raw "prefix:local" -> "{uri}local", prefilled with the root/record qnames of the config
+    _qname_cache: dict[str, str] = field(default_factory=dict, init=False, repr=False)
+    # compiled path parts (GeneratorConfig.compiled_rules) -> the tags this builder uses
+    _record_parts: dict[tuple[str, ...], tuple[str, ...]] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        names = [self.cfg.root.qname, *(self.cfg.root.attributes or {})]
+
+        def walk(children: dict) -> None:
+            for k, v in children.items():
+                names.append(k)
+                if isinstance(v, dict):
+                    walk(v)
+
+        walk(self.cfg.root.children or {})
+        names += [q for q in (self.cfg.record_element, self.cfg.record_container_qname,
+                              self.cfg.record_element_qname) if q]
+        for qname in names:
+            try:
+                self._qname_cache[qname] = self.cfg.clark(qname)
+            except KeyError:
+                pass  # unknown prefix: reported by _qname if it is ever used
+
+        # compiled_rules puts bare path segments in the msg namespace; like _qname, this
+        # builder has always left them un-namespaced
+        for rule, parts, _ in self.cfg.compiled_rules():
+            tags = []
+            for part in rule.to_path.split("/"):
+                local, at, _ = part.partition("@")
+                if local:
+                    tags.append(self.cfg.clark(local))
+                if at:
+                    break
+            self._record_parts[parts] = tuple(tags)
 
     def _register_namespaces(self) -> None:
         for prefix, uri in self.cfg.namespaces.items():
             ET.register_namespace(prefix if prefix != "default" else "", uri)
 
     def _qname(self, qname: str) -> str:
-        if ":" in qname:
-            prefix, local = qname.split(":", 1)
-            uri = self.cfg.namespaces.get(prefix)
-            if not uri:
-                raise KeyError(f"Unknown namespace prefix '{prefix}' in qname '{qname}'")
-            return f"{{{uri}}}{local}"
-        return qname  # no namespace
+        clark = self._qname_cache.get(qname)
+        if clark is None:
+            # not seen at init; unprefixed names stay un-namespaced
+            clark = self._qname_cache[qname] = self.cfg.clark(qname)
+        return clark
 
     def build_root(self) -> ET.Element:
         self._register_namespaces()
@@ -46,7 +79,8 @@ class XmlBuilder:
         else:
             el.text = resolve_macros(str(obj))
 
-    def append_record(self, parent: ET.Element, fields: list[tuple[str, str]]) -> None:
+    def append_record(self, parent: ET.Element,
+                      fields: Iterable[tuple[tuple[str, ...], str | None, str]]) -> None:
         if self.cfg.record_container_qname and self.cfg.record_element_qname:
             container = self.ensure_container(parent, self.cfg.record_container_qname)
             self.append_record_into(container, self.cfg.record_element_qname, fields)
@@ -54,36 +88,29 @@ class XmlBuilder:
         # legacy fallback
         tag = self._qname(self.cfg.record_element or "Record")
         rec_el = ET.SubElement(parent, tag)
-        for path, value in fields:
-            self._ensure_path(rec_el, path, value)
+        for parts, attr, value in fields:
+            self._ensure_path(rec_el, parts, attr, value)
 
 
-    def _ensure_path(self, base: ET.Element, path: str, value: str) -> None:
-        # path like "rep:Instrument/rep:ISIN"
+    def _ensure_path(self, base: ET.Element, parts: tuple[str, ...], attr: str | None, value: str) -> None:
+        # parts come from GeneratorConfig.compiled_rules; bare segments lose the msg namespace again
         current = base
-        parts = path.split("/")
-        for i, part in enumerate(parts):
-            tag = self._qname(part)
+        for tag in self._record_parts.get(parts, parts):
             found = current.find(tag)
             if found is None:
                 found = ET.SubElement(current, tag)
             current = found
-            if i == len(parts) - 1:
-                current.text = value
-
-    def write(self, root: ET.Element, out_path: Path) -> None:
-        tree = ET.ElementTree(root)
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        tree.write(out_path, encoding="utf-8", xml_declaration=True)
+        if attr:
+            current.set(attr, value)
+        else:
+            current.text = value
 
     def write(self, root: ET.Element, out_path: Path, pretty: bool = True) -> None:
         out_path.parent.mkdir(parents=True, exist_ok=True)
         if pretty:
-            # Serialize, parse with minidom, then re-serialize with indent
-            rough_string = ET.tostring(root, encoding="utf-8", xml_declaration=True)
-            parsed = xml.dom.minidom.parseString(rough_string)
-            pretty_xml = parsed.toprettyxml(indent="  ", encoding="utf-8")
-            out_path.write_bytes(pretty_xml)
-        else:
-            tree = ET.ElementTree(root)
-            tree.write(out_path, encoding="utf-8", xml_declaration=True)
+            # Single conversion to lxml, then let libxml2 indent while serializing
+            doc = LET.fromstring(ET.tostring(root))
+            out_path.write_bytes(LET.tostring(doc, pretty_print=True, xml_declaration=True, encoding="utf-8"))
+            return
+        tree = ET.ElementTree(root)
+        tree.write(out_path, encoding="utf-8", xml_declaration=True)
@@ -1,12 +1,163 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from copy import deepcopy
+import datetime
+import os
+import secrets
+import stat
+import tempfile
 from pathlib import Path
+from typing import Iterable
 from lxml import etree as LET
 from .config import GeneratorConfig, resolve_macros
 
-@dataclass
+# stream_write flushes the output buffer after this many Tx elements
+FLUSH_EVERY = 10_000
+
+# Schema order of the inner <New><Tx> children (rules may list them in any order)
+INNER_TX_ORDER = ["TradDt", "TradgCpcty", "Qty", "Pric", "TradVn"]
+_INNER_TX_INDEX = {name: i for i, name in enumerate(INNER_TX_ORDER)}
+
+
+def _insert_in_tx_order(parent, new_child) -> None:
+    """Insert new_child before the first sibling that INNER_TX_ORDER places after it."""
+    new_idx = _INNER_TX_INDEX.get(new_child.tag.split("}", 1)[-1])
+    if new_idx is None:
+        parent.append(new_child)
+        return
+    for i, sib in enumerate(parent):
+        if _INNER_TX_INDEX.get(sib.tag.split("}", 1)[-1], -1) > new_idx:
+            parent.insert(i, new_child)
+            return
+    parent.append(new_child)
+
+
+def _ensure_path(root, parts, attr, value, cache=None, inner_tx=None):
+    """
+    Create missing elements along the pre-qualified path `parts` ("{ns}local" tags).
+    `cache` maps already-seen path prefixes (tuples of parts) to their element;
+    pass the same dict for every field of a Tx to skip repeated find() scans.
+    If `attr` is set, set that attribute on the last element instead of its text.
+    Supports nested paths like: New/Tx/Pric/Pric/MntryVal/Amt@Ccy.
+    Children of the element at prefix `inner_tx` are inserted in INNER_TX_ORDER.
+    """
+    if cache is None:
+        cache = {(): root}
+    current = root
+    parent_key = ()
+
+    for i in range(1, len(parts) + 1):
+        key = parts[:i]
+        child = cache.get(key)
+        if child is None:
+            child = LET.Element(parts[i - 1])
+            if parent_key == inner_tx:
+                _insert_in_tx_order(current, child)
+            else:
+                current.append(child)
+            cache[key] = child
+        current = child
+        parent_key = key
+
+    if value is None:
+        return
+    if attr:
+        current.set(attr, str(value))
+    else:
+        current.text = str(value)
+
+
+def _report_mode(out_path: Path) -> int:
+    """Permission bits for a new report: out_path's current mode, else 0o666 minus umask."""
+    try:
+        return stat.S_IMODE(os.stat(out_path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _prune_empty(el) -> None:
+    """Remove el, then each ancestor it leaves empty, stopping at the Tx/New skeleton."""
+    parent = el.getparent()
+    while parent is not None and parent.getparent() is not None:  # never drop New
+        if len(el) or el.text or el.attrib:
+            return
+        parent.remove(el)
+        el, parent = parent, parent.getparent()
+
+
+def compile_tx_builder(cfg: GeneratorConfig, columns: Iterable[str], literals: dict[str, str]):
+    """
+    Specialize cfg's mapping rules into a build_tx(container, row) function that appends
+    one complete <Tx> for a CSV row. Rules are split once by the CSV header `columns`:
+    a rule whose from_field is a column reads row[column]; any other rule is a literal whose
+    resolved value (`literals`, see FieldMapper.literal_values) is baked into the skeleton,
+    or dropped when empty. The skeleton <Tx> holds every mapped element in schema order and
+    is built once; each row deep-copies it, assigns the column values by position with
+    straight-line generated code, and prunes elements whose column was empty.
+    """
+    msg_ns = cfg.namespaces.get("msg")
+    if not msg_ns:
+        raise KeyError("Unknown ns prefix: msg")
+    tx_tag = f"{{{msg_ns}}}Tx"
+    new_tag = f"{{{msg_ns}}}New"
+
+    # Skeleton, built with the same path logic as append_tx. Its default namespace matches
+    # the one declared on <Document>, so lxml drops it as redundant when a copy is appended.
+    template = LET.Element(tx_tag, nsmap={None: msg_ns})
+    new_el = LET.SubElement(template, new_tag)
+    cache = {(): template, (new_tag,): new_el}
+    columns = frozenset(columns)
+    column_rules = []
+    for rule, parts, attr in cfg.compiled_rules():
+        src = rule.from_field
+        if src in columns:
+            _ensure_path(template, parts, attr, None, cache, (new_tag, tx_tag))
+            column_rules.append((src, parts, attr))
+        elif literals[src]:
+            _ensure_path(template, parts, attr, literals[src], cache, (new_tag, tx_tag))
+    position = {id(el): i for i, el in enumerate(template.iter())}
+
+    lines = [
+        "def build_tx(container, row):",
+        "    tx = deepcopy(template)",
+        "    els = list(tx.iter())",
+        "    empty = []",
+    ]
+    for src, parts, attr in column_rules:
+        idx = position[id(cache[parts])]
+        lines.append(f"    v = row[{src!r}]")
+        lines.append("    if v:")
+        if attr:
+            lines.append(f"        els[{idx}].set({attr!r}, v)")
+        else:
+            lines.append(f"        els[{idx}].text = v")
+        lines.append("    else:")
+        lines.append(f"        empty.append(els[{idx}])")
+    lines += [
+        "    for el in empty:",
+        "        prune_empty(el)",
+        "    container.append(tx)",
+        "    return tx",
+    ]
+    source = "\n".join(lines) + "\n"
+
+    namespace = {"deepcopy": deepcopy, "template": template, "prune_empty": _prune_empty}
+    exec(compile(source, "<mifid_tx_gen.build_tx>", "exec"), namespace)
+    return namespace["build_tx"]
+
+@dataclass(slots=True)
 class IsoXmlBuilder:
     cfg: GeneratorConfig
+    # message ids are "mf-" + this random 64-bit prefix + a counter (35 chars, ISO Max35Text)
+    _id_prefix: str = field(default_factory=lambda: secrets.token_hex(8), init=False, repr=False)
+    _id_counter: int = field(default=0, init=False, repr=False)
+
+    def _next_id(self) -> str:
+        msg_id = f"mf-{self._id_prefix}{self._id_counter:016x}"
+        self._id_counter += 1
+        return msg_id
 
     def _uri(self, prefix: str) -> str:
         uri = self.cfg.namespaces.get(prefix)
@@ -24,8 +175,13 @@ class IsoXmlBuilder:
         msg     = self._uri("msg")
         xsi     = self._uri("xsi")
 
-        # <BizData xmlns="head003" xmlns:xsi="...">
-        root = LET.Element(LET.QName(head003, "BizData"), nsmap={None: head003, "xsi": xsi})
+        # <BizData xmlns="head003" xmlns:hdr="head001" xmlns:xsi="...">
+        # Each namespace is declared once: these here, the payload's default one on
+        # <Document>. Everything else is created without nsmap.
+        root = LET.Element(
+            LET.QName(head003, "BizData"),
+            nsmap={None: head003, "hdr": head001, "xsi": xsi},
+        )
 
         # schemaLocation
         sl = (self.cfg.root.attributes or {}).get("xsi:schemaLocation")
@@ -35,8 +191,8 @@ class IsoXmlBuilder:
         # <Hdr>
         hdr = LET.SubElement(root, LET.QName(head003, "Hdr"))
 
-        # <AppHdr xmlns="head001">
-        apphdr = LET.SubElement(hdr, LET.QName(head001, "AppHdr"), nsmap={None: head001})
+        # <hdr:AppHdr>
+        apphdr = LET.SubElement(hdr, LET.QName(head001, "AppHdr"))
         fr = LET.SubElement(apphdr, LET.QName(head001, "Fr"))
 
         # OrgId -> Id -> OrgId -> Othr -> Id + SchmeNm/Prtry("LEI")  ✅ ESMAUG-compliant
@@ -62,18 +218,18 @@ class IsoXmlBuilder:
         LET.SubElement(to_schme, LET.QName(head001, "Prtry")).text = "LEI"
 
         # --- BizMsgIdr (unique id) ---
-        import uuid, datetime
-        LET.SubElement(apphdr, LET.QName(head001, "BizMsgIdr")).text = "mf-" + uuid.uuid4().hex[:33]
+        LET.SubElement(apphdr, LET.QName(head001, "BizMsgIdr")).text = self._next_id()
 
 
         # --- MsgDefIdr (must match the business message definition) ---
         LET.SubElement(apphdr, LET.QName(head001, "MsgDefIdr")).text = "auth.016.001.01"
 
         # --- CreDt (after MsgDefIdr) ---
-        LET.SubElement(apphdr, LET.QName(head001, "CreDt")).text = datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+        created = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        LET.SubElement(apphdr, LET.QName(head001, "CreDt")).text = created.isoformat().replace("+00:00", "Z")
 
 
-        # <Pyld><Document xmlns="auth.016">
+        # <Pyld><Document xmlns="auth.016">, unprefixed to keep the per-Tx markup small
         pyld = LET.SubElement(root, LET.QName(head003, "Pyld"))
         doc  = LET.SubElement(pyld, LET.QName(msg, "Document"), nsmap={None: msg})
 
@@ -82,135 +238,117 @@ class IsoXmlBuilder:
 
         return root, container
 
-
-    # xml_builder_iso.py
-    import lxml.etree as LET
-
     def append_tx(self, container, fields):
+        """
+        Append and return one <Tx> built from `fields`, any iterable of
+        (parts, attr, value) such as FieldMapper.iter_xml_fields(trade).
+        """
         # Always bind children to the auth.016 namespace so lookups work.
         msg_ns = self._uri("msg")  # => "urn:iso:std:iso:20022:tech:xsd:auth.016.001.01"
 
         tx = LET.SubElement(container, LET.QName(msg_ns, "Tx"))
         # ensure a single <New> exists under this Tx
-        new_el = tx.find(f"./{{{msg_ns}}}New")
-        if new_el is None:
-            new_el = LET.SubElement(tx, LET.QName(msg_ns, "New"))
+        new_tag = f"{{{msg_ns}}}New"
+        new_el = LET.SubElement(tx, new_tag)
 
-        # Fill content according to mapping rules
-        for path, value in fields:
-            self._ensure_path(tx, path, value)
+        # Per-Tx cache: tuple of path parts -> element, so each segment is a dict hit
+        cache = {(): tx, (new_tag,): new_el}
+        # New/Tx is the element whose children must follow INNER_TX_ORDER
+        inner_tx = (new_tag, f"{{{msg_ns}}}Tx")
 
+        # Fill content according to mapping rules (parts are pre-qualified, see GeneratorConfig.compiled_rules)
+        for parts, attr, value in fields:
+            _ensure_path(tx, parts, attr, value, cache, inner_tx)
+        return tx
 
+    def write(self, root: LET._Element, out_path: Path, pretty: bool = True) -> None:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        xml_bytes = LET.tostring(root, xml_declaration=True, encoding="utf-8", pretty_print=pretty)
+        out_path.write_bytes(xml_bytes)
 
 
-    def _ensure_path(self, root, path, value):
+    def stream_write(self, out_path: Path, rows_iter, mapper, pretty: bool = True) -> None:
         """
-        Create missing elements along /-separated path.
-        If the last segment contains '@attr', set that attribute on the element.
-        Supports nested paths like: New/Tx/Pric/Pric/MntryVal/Amt@Ccy.
-        Ensures inner Tx children are inserted in schema order.
+        Write the report incrementally with lxml.etree.xmlfile: the header once, then
+        one <Tx> per CSV row, each dropped as soon as it is serialized. Peak memory is
+        a single Tx regardless of trade count. Every row must carry the full CSV header
+        (CsvReader.rows pads short rows): the builder is specialized to the first row's keys.
         """
-        NS_AUTH = "urn:iso:std:iso:20022:tech:xsd:auth.016.001.01"
-        NS_HEAD = "urn:iso:std:iso:20022:tech:xsd:head.001.001.01"
-
-        INNER_TX_ORDER = ["TradDt", "TradgCpcty", "Qty", "Pric", "TradVn"]
-
-        def get_ns(elem):
-            # return the namespace of an element tag {ns}local or None
-            t = elem.tag
-            if isinstance(t, str) and t.startswith("{"):
-                return t[1:].split("}")[0]
-            return None
-
-        def qname(ns, tag):
-            return LET.QName(ns, tag)
-
-        def is_inner_tx(parent):
-            """
-            True if parent is the *inner* Tx (child of New), not the outer wrapper Tx.
-            We identify it as:
-              - localname == 'Tx' AND
-              - namespace == auth016 AND
-              - it does NOT have 'New' or 'Cxl' among its direct children.
-            """
-            tag = parent.tag
-            if not (tag.endswith("}Tx") or tag == "Tx"):
-                return False
-            ns = get_ns(parent)
-            if ns != NS_AUTH:
-                return False
-            for child in parent:
-                ln = child.tag.split("}", 1)[-1]
-                if ln in ("New", "Cxl"):
-                    return False  # that's the OUTER Tx
-            return True
-
-        def insert_child_in_order(parent, new_child):
-            """
-            Insert new_child into parent respecting INNER_TX_ORDER if parent is inner Tx.
-            Otherwise, append at the end.
-            """
-            if not is_inner_tx(parent):
-                parent.append(new_child)
-                return
-
-            new_ln = new_child.tag.split("}", 1)[-1]
-            try:
-                new_idx = INNER_TX_ORDER.index(new_ln)
-            except ValueError:
-                parent.append(new_child)
-                return
-
-            # Insert before the first sibling that should come AFTER new_child.
-            for after_ln in INNER_TX_ORDER[new_idx + 1:]:
-                for i, sib in enumerate(list(parent)):
-                    sib_ln = sib.tag.split("}", 1)[-1]
-                    if sib_ln == after_ln:
-                        parent.insert(i, new_child)
-                        return
-
-            parent.append(new_child)
-
-        # --- actual path creation logic (fixed indentation) ---
-        current = root
-        parts = [p for p in path.split("/") if p]
-        default_ns = get_ns(root) or NS_AUTH
-        set_text_at_end = True
-
-        for i, part in enumerate(parts):
-            # Attribute segment on the current element to create/find
-            if "@" in part:
-                elem_tag, attr_name = part.split("@", 1)
-                if elem_tag:
-                    ns = get_ns(current) or default_ns
-                    child = current.find(f"./{{{ns}}}{elem_tag}")
-                    if child is None:
-                        new_child = LET.Element(qname(ns, elem_tag))
-                        insert_child_in_order(current, new_child)
-                        child = new_child
-                    current = child
-                if value is not None:
-                    current.set(attr_name, str(value))
-                # since terminal is attribute, don't set text later
-                set_text_at_end = False
-                return
-
-            # Normal element segment (this MUST be inside the loop)
-            ns = get_ns(current) or default_ns
-            child = current.find(f"./{{{ns}}}{part}")
-            if child is None:
-                new_child = LET.Element(qname(ns, part))
-                insert_child_in_order(current, new_child)
-                child = new_child
-            current = child
-
-        # After walking all segments, set text if appropriate
-        if set_text_at_end and value is not None:
-            current.text = str(value)
-
+        def txs(container):
+            build_tx = None
+            for row in rows_iter:
+                if build_tx is None:
+                    build_tx = compile_tx_builder(self.cfg, row, mapper.literal_values)
+                yield build_tx(container, row)
 
+        self._stream(out_path, txs, pretty)
 
-    def write(self, root: LET._Element, out_path: Path, pretty: bool = True) -> None:
+    def _stream(self, out_path: Path, txs, pretty: bool) -> None:
+        """
+        Write header and envelope around the Tx elements yielded by txs(container).
+        Output goes to a temp file in out_path's directory that replaces out_path only once
+        the document is complete; on any error it is removed and out_path is left untouched.
+        """
         out_path.parent.mkdir(parents=True, exist_ok=True)
-        xml_bytes = LET.tostring(root, xml_declaration=True, encoding="utf-8", pretty_print=pretty)
-        out_path.write_bytes(xml_bytes)
+        root, container = self.build_root()
+        doc = container.getparent()
+        pyld = doc.getparent()
+        hdr = pyld.getprevious()
+        # xf.write() re-declares every in-scope namespace on each subtree it serializes, so
+        # serialize <Hdr> and the Tx elements under detached parents that declare only the
+        # namespaces they use: <Hdr xmlns xmlns:hdr> and <Tx xmlns="auth.016">.
+        hdr_parent = LET.Element(root.tag, nsmap={None: self._uri("head003"), "hdr": self._uri("head001")})
+        hdr_parent.append(hdr)
+        tx_parent = LET.Element(container.tag, nsmap={None: self._uri("msg")})
+
+        def own_nsmap(el):
+            # only the declarations this element adds on top of its parent
+            parent = el.getparent()
+            inherited = parent.nsmap if parent is not None else {}
+            return {k: v for k, v in el.nsmap.items() if inherited.get(k) != v}
+
+        def nl(level):
+            return "\n" + "  " * level if pretty else ""
+
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{out_path.name}.", suffix=".tmp", dir=out_path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                with LET.xmlfile(f, encoding="utf-8") as xf:
+                    xf.write_declaration()
+                    with xf.element(root.tag, dict(root.attrib), nsmap=own_nsmap(root)):
+                        if pretty:
+                            LET.indent(hdr, space="  ", level=1)
+                        xf.write(nl(1))
+                        xf.write(hdr)
+                        xf.write(nl(1))
+                        with xf.element(pyld.tag, nsmap=own_nsmap(pyld)):
+                            xf.write(nl(2))
+                            with xf.element(doc.tag, nsmap=own_nsmap(doc)):
+                                xf.write(nl(3))
+                                with xf.element(container.tag, nsmap=own_nsmap(container)):
+                                    written = 0
+                                    for tx in txs(tx_parent):
+                                        if pretty:
+                                            LET.indent(tx, space="  ", level=4)
+                                        xf.write(nl(4))
+                                        xf.write(tx)
+                                        # free the serialized subtree right away and detach it
+                                        tx.clear(keep_tail=True)
+                                        tx_parent.remove(tx)
+                                        written += 1
+                                        if written % FLUSH_EVERY == 0:
+                                            xf.flush()
+                                    if written:
+                                        xf.write(nl(3))
+                                xf.write(nl(2))
+                            xf.write(nl(1))
+                        xf.write(nl(0))
+                if pretty:
+                    f.write(b"\n")  # xmlfile only writes inside the root element
+            # mkstemp creates 0600; give the report the mode a plain open() would
+            os.chmod(tmp_path, _report_mode(out_path))
+            os.replace(tmp_path, out_path)
+        except BaseException:
+            # an exception still closes every open xf.element(), which would look complete
+            os.unlink(tmp_path)
+            raise
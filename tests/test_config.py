@@ -0,0 +1,16 @@
+from pathlib import Path
+from mifid_tx_gen.config import GeneratorConfig
+
+MSG = "urn:iso:std:iso:20022:tech:xsd:auth.016.001.01"
+
+def test_compiled_rules_qualify_paths_and_split_attribute():
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    compiled = {rule.to_path: (parts, attr) for rule, parts, attr in cfg.compiled_rules()}
+
+    parts, attr = compiled["New/Tx/Pric/Pric/MntryVal/Amt@Ccy"]
+    assert parts == tuple(f"{{{MSG}}}{p}" for p in ("New", "Tx", "Pric", "Pric", "MntryVal", "Amt"))
+    assert attr == "Ccy"
+
+    parts, attr = compiled["New/TxId"]
+    assert parts == (f"{{{MSG}}}New", f"{{{MSG}}}TxId")
+    assert attr is None
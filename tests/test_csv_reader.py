@@ -0,0 +1,30 @@
+from pathlib import Path
+import pytest
+from mifid_tx_gen.csv_reader import CsvReader
+
+def test_rows_strip_and_pad_short_rows(tmp_path: Path):
+    p = tmp_path / "t.csv"
+    p.write_text(" trade_id , isin ,price\n T1 , FR0000131104 ,1.5\n\nT2,GB00B03MLX29\n", encoding="utf-8")
+    rows = list(CsvReader(p).rows())
+    assert rows == [
+        {"trade_id": "T1", "isin": "FR0000131104", "price": "1.5"},
+        {"trade_id": "T2", "isin": "GB00B03MLX29", "price": ""},
+    ]
+
+def test_arrow_rows_match_stdlib(tmp_path: Path):
+    pytest.importorskip("pyarrow")
+    p = tmp_path / "t.csv"
+    p.write_text(' trade_id ,price,venue\n T1 ,50.10,"X,PAR"\n\nT2,,XOFF\n', encoding="utf-8")
+    assert list(CsvReader(p, use_arrow=True).rows()) == list(CsvReader(p).rows())
+
+@pytest.mark.parametrize("use_arrow", [False, True])
+def test_ragged_rows_read_the_same_on_both_paths(tmp_path: Path, use_arrow: bool):
+    if use_arrow:
+        pytest.importorskip("pyarrow")
+    p = tmp_path / "t.csv"
+    p.write_text("trade_id,isin,price\nT1,X,1\nT2,Y\nT3,Z,3,extra\n", encoding="utf-8")
+    assert list(CsvReader(p, use_arrow=use_arrow).rows()) == [
+        {"trade_id": "T1", "isin": "X", "price": "1"},
+        {"trade_id": "T2", "isin": "Y", "price": ""},
+        {"trade_id": "T3", "isin": "Z", "price": "3"},
+    ]
@@ -0,0 +1,24 @@
+import os
+from pathlib import Path
+import pytest
+from lxml import etree as LET
+from mifid_tx_gen.generator import ReportGenerator
+
+MSG = "urn:iso:std:iso:20022:tech:xsd:auth.016.001.01"
+
+@pytest.mark.skipif(not Path("/dev/fd").is_dir(), reason="needs /dev/fd")
+@pytest.mark.parametrize("use_arrow", [False, True])
+def test_generate_reads_csv_from_a_pipe(tmp_path: Path, use_arrow: bool):
+    # a pipe can be read once: opening it again (e.g. to peek at the header) sees EOF
+    r, w = os.pipe()
+    os.write(w, Path("samples/trades.csv").read_bytes())
+    os.close(w)
+    try:
+        gen = ReportGenerator.from_paths(Path(f"/dev/fd/{r}"), Path("config/mapping.json"), None,
+                                         use_arrow=use_arrow)
+        out = gen.generate(tmp_path / "out.xml")
+    finally:
+        os.close(r)
+
+    txs = LET.parse(str(out)).getroot().findall(f".//{{{MSG}}}FinInstrmRptgTxRpt/{{{MSG}}}Tx")
+    assert [t.findtext(f"{{{MSG}}}New/{{{MSG}}}TxId") for t in txs] == ["T1", "T2"]
@@ -0,0 +1,32 @@
+from pathlib import Path
+from mifid_tx_gen.config import GeneratorConfig
+from mifid_tx_gen.domain import TradeRecord
+from mifid_tx_gen.mapper import FieldMapper
+
+def _by_path(cfg, fields):
+    paths = {(parts, attr): rule.to_path for rule, parts, attr in cfg.compiled_rules()}
+    return {paths[parts, attr]: v for parts, attr, v in fields}
+
+def test_columns_and_literals(monkeypatch):
+    monkeypatch.setenv("FIRM_LEI", "FIRMLEI0000000000001")
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    mapper = FieldMapper(cfg)
+    # env is read once, when the mapper is built
+    monkeypatch.setenv("FIRM_LEI", "CHANGED")
+
+    out = _by_path(cfg, mapper.to_xml_fields(TradeRecord({"trade_id": "T1", "isin": "", "price": "1.5"})))
+    assert out["New/TxId"] == "T1"
+    assert out["New/ExctgPty"] == "FIRMLEI0000000000001"
+    assert out["New/InvstmtPtyInd"] == "false"
+    assert out["New/Tx/Pric/Pric/MntryVal/Amt"] == "1.5"
+    # empty CSV values are dropped
+    assert "New/FinInstrm/Id" not in out
+
+def test_rule_order_is_kept_across_columns_and_literals():
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    mapper = FieldMapper(cfg)
+    row = {"trade_id": "T1", "buyer_lei": "B", "seller_lei": "S"}
+    for _ in range(2):
+        out = list(_by_path(cfg, mapper.to_xml_fields(TradeRecord(row))))
+        assert out[:6] == ["New/TxId", "New/ExctgPty", "New/InvstmtPtyInd", "New/SubmitgPty",
+                           "New/Buyr/AcctOwnr/Id/LEI", "New/Sellr/AcctOwnr/Id/LEI"]
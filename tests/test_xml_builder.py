@@ -0,0 +1,17 @@
+from pathlib import Path
+from mifid_tx_gen.config import GeneratorConfig
+from mifid_tx_gen.domain import TradeRecord
+from mifid_tx_gen.mapper import FieldMapper
+from mifid_tx_gen.xml_builder import XmlBuilder
+
+def test_append_record_leaves_bare_segments_unqualified():
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    cfg.record_container_qname = None  # legacy direct-child <Record> layout
+    builder = XmlBuilder(cfg)
+    root = builder.build_root()
+    builder.append_record(root, FieldMapper(cfg).iter_xml_fields(TradeRecord({"trade_id": "T1", "price": "1.5"})))
+
+    rec = root[-1]
+    assert rec.tag == "Record"
+    assert rec.findtext("New/TxId") == "T1"
+    assert rec.find("New/Tx/Pric/Pric/MntryVal/Amt").text == "1.5"
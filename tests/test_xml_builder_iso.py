@@ -0,0 +1,119 @@
+import os
+import stat
+from pathlib import Path
+import pytest
+from lxml import etree as LET
+from mifid_tx_gen.config import GeneratorConfig
+from mifid_tx_gen.csv_reader import CsvReader
+from mifid_tx_gen.domain import TradeRecord
+from mifid_tx_gen.mapper import FieldMapper
+from mifid_tx_gen.xml_builder_iso import IsoXmlBuilder, compile_tx_builder
+
+MSG = "urn:iso:std:iso:20022:tech:xsd:auth.016.001.01"
+
+def test_stream_write_matches_in_memory_build(tmp_path: Path):
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    rows = list(CsvReader(Path("samples/trades.csv")).rows())
+
+    streamed = tmp_path / "streamed.xml"
+    IsoXmlBuilder(cfg).stream_write(streamed, iter(rows), FieldMapper(cfg))
+
+    builder = IsoXmlBuilder(cfg)
+    root, container = builder.build_root()
+    mapper = FieldMapper(cfg)
+    for row in rows:
+        builder.append_tx(container, mapper.iter_xml_fields(TradeRecord(row)))
+
+    got = LET.parse(str(streamed), LET.XMLParser(remove_blank_text=True)).getroot()
+    got_txs = got.findall(f".//{{{MSG}}}FinInstrmRptgTxRpt/{{{MSG}}}Tx")
+    assert [LET.tostring(t, method="c14n") for t in got_txs] == \
+           [LET.tostring(t, method="c14n") for t in container]
+    assert [t.findtext(f"{{{MSG}}}New/{{{MSG}}}TxId") for t in got_txs] == ["T1", "T2"]
+    # pretty output ends with a newline, like LET.tostring(pretty_print=True)
+    assert streamed.read_bytes().endswith(b"</BizData>\n")
+
+def test_inner_tx_children_follow_schema_order():
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    builder = IsoXmlBuilder(cfg)
+    _, container = builder.build_root()
+    q = lambda *names: tuple(f"{{{MSG}}}{n}" for n in names)
+    tx = builder.append_tx(container, [
+        (q("New", "Tx", "TradVn"), None, "XPAR"),
+        (q("New", "Tx", "Qty", "Unit"), None, "100"),
+        (q("New", "Tx", "TradDt"), None, "2024-10-01T09:01:02Z"),
+    ])
+    inner = tx.find(f"{{{MSG}}}New/{{{MSG}}}Tx")
+    assert [LET.QName(c).localname for c in inner] == ["TradDt", "Qty", "TradVn"]
+
+def test_compiled_builder_matches_append_tx_with_missing_fields():
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    mapper = FieldMapper(cfg)
+    builder = IsoXmlBuilder(cfg)
+    _, container = builder.build_root()
+    row = {"trade_id": "T9", "isin": "", "price": "", "trade_currency": "EUR", "venue": "XPAR"}
+
+    expected = builder.append_tx(container, mapper.iter_xml_fields(TradeRecord(row)))
+    got = compile_tx_builder(cfg, row, mapper.literal_values)(container, row)
+
+    assert LET.tostring(got) == LET.tostring(expected)
+    assert got.find(f".//{{{MSG}}}FinInstrm") is None
+
+def test_message_ids_are_unique_and_fit_max35text():
+    builder = IsoXmlBuilder(GeneratorConfig.load(Path("config/mapping.json")))
+    ids = [builder._next_id() for _ in range(3)]
+    assert len(set(ids)) == 3
+    assert all(i.startswith("mf-") and len(i) == 35 for i in ids)
+
+def test_streamed_file_declares_namespaces_only_where_needed(tmp_path: Path):
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    reader = CsvReader(Path("samples/trades.csv"))
+    out = tmp_path / "out.xml"
+    IsoXmlBuilder(cfg).stream_write(out, reader.rows(), FieldMapper(cfg))
+
+    xml = out.read_text(encoding="utf-8")
+    n_tx = xml.count(f'<Tx xmlns="{MSG}">')
+    assert n_tx == 2
+    # BizData: default, hdr, xsi; Hdr: default, hdr; Document: default; one per Tx
+    assert xml.count("xmlns") == 3 + 2 + 1 + n_tx
+    assert "msg:" not in xml
+
+def test_failed_stream_write_leaves_no_output(tmp_path: Path):
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    out = tmp_path / "out.xml"
+
+    def rows():
+        yield {"trade_id": "T1"}
+        raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+    with pytest.raises(UnicodeDecodeError):
+        IsoXmlBuilder(cfg).stream_write(out, rows(), FieldMapper(cfg))
+    assert list(tmp_path.iterdir()) == []
+
+def test_compiled_builder_splits_columns_from_header():
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    mapper = FieldMapper(cfg)
+    build_tx = compile_tx_builder(cfg, ["trade_id"], mapper.literal_values)
+    _, container = IsoXmlBuilder(cfg).build_root()
+
+    # "isin" is not in the header, so its rule is a literal even if a row carries the key
+    tx = build_tx(container, {"trade_id": "T1", "isin": "FR0000131104"})
+    assert tx.findtext(f"{{{MSG}}}New/{{{MSG}}}TxId") == "T1"
+    assert tx.findtext(f".//{{{MSG}}}FinInstrm/{{{MSG}}}Id") == mapper.literal_values["isin"]
+    assert tx.findtext(f"{{{MSG}}}New/{{{MSG}}}InvstmtPtyInd") == "false"
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+def test_stream_write_uses_umask_or_existing_mode(tmp_path: Path):
+    cfg = GeneratorConfig.load(Path("config/mapping.json"))
+    rows = [{"trade_id": "T1"}]
+    new, existing = tmp_path / "new.xml", tmp_path / "existing.xml"
+    existing.write_text("")
+    existing.chmod(0o640)
+
+    old_umask = os.umask(0o022)
+    try:
+        IsoXmlBuilder(cfg).stream_write(new, iter(rows), FieldMapper(cfg))
+        IsoXmlBuilder(cfg).stream_write(existing, iter(rows), FieldMapper(cfg))
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE(new.stat().st_mode) == 0o644
+    assert stat.S_IMODE(existing.stat().st_mode) == 0o640